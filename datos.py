@@ -0,0 +1,228 @@
+"""
+
+Funciones compartidas para cargar los datasets de dengue
+y exportar las gráficas.
+
+La primera vez que cargamos un año, el CSV original se convierte a Parquet
+y se guarda junto a él. Las siguientes lecturas usan ese archivo, el cual
+es mucho más rápido de leer y nos permite cargar solo las columnas necesarias.
+Si el CSV se reemplaza por uno más reciente, el Parquet se vuelve a generar.
+
+Los resultados intermedios, como los totales por municipio, se guardan en la
+carpeta 'cache'. Para volver a calcularlos basta con borrar esa carpeta.
+
+"""
+
+import gc
+import os
+import pickle
+
+import orjson
+import pandas as pd
+import plotly.io as pio
+
+
+# Tipos de datos para las columnas codificadas que usamos en los scripts.
+# La columna 'DICTAMEN' puede tener valores nulos.
+TIPOS = {
+    "ESTATUS_CASO": "int8",
+    "DICTAMEN": "Int8",
+    "SEXO": "int8",
+    "EDAD_ANOS": "int16",
+    "ENTIDAD_RES": "int8",
+    "MUNICIPIO_RES": "int16",
+    "RESULTADO_PCR": "int8",
+}
+
+
+def configurar_kaleido():
+    """
+    Desactiva MathJax en Kaleido, ya que ninguna de nuestras gráficas usa
+    fórmulas. Kaleido mantiene un proceso de Chromium por intérprete, así que
+    la configuración aplica a todas las imágenes que se exporten desde él.
+
+    """
+
+    # El objeto 'scope' solo existe con la versión de Kaleido que usa Plotly 5.
+    if pio.kaleido.scope is not None:
+        pio.kaleido.scope.mathjax = None
+
+
+def guardar_archivo(ruta, escribir):
+    """
+    Guarda un archivo escribiéndolo primero a un archivo temporal que
+    después se renombra. Así otro proceso nunca leerá un archivo a medio
+    escribir. Si la escritura falla, el archivo temporal se borra.
+
+    Parameters
+    ----------
+    ruta: str
+        La ruta final del archivo.
+
+    escribir: callable
+        La función que escribe el contenido. Recibe la ruta temporal.
+
+    """
+
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+
+    try:
+        escribir(temporal)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def cargar_dataset(año, columnas, filtros=None):
+    """
+    Carga las columnas indicadas del dataset de dengue de un año.
+
+    Parameters
+    ----------
+    año: int
+        El año del dataset que se desea cargar.
+
+    columnas: list
+        Las columnas que se desean cargar.
+
+    filtros: list, optional
+        Condiciones como [("ESTATUS_CASO", "==", 2)] que deben cumplir los
+        registros. Se aplican al leer el archivo Parquet, por lo que los
+        registros descartados nunca se cargan en memoria.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El dataset con solo las columnas y registros indicados.
+
+    """
+
+    ruta = f"./data/{año}.parquet"
+    ruta_csv = f"./data/{año}.csv"
+
+    # Si aún no existe el archivo Parquet o el CSV es más reciente
+    # (por ejemplo, al descargar una nueva versión), lo creamos a partir del CSV.
+    actualizado = os.path.exists(ruta) and (
+        not os.path.exists(ruta_csv)
+        or os.path.getmtime(ruta) >= os.path.getmtime(ruta_csv)
+    )
+
+    if not actualizado:
+        df = pd.read_csv(ruta_csv, dtype=TIPOS, engine="c")
+
+        # Algunos años usan fechas como dd/mm/aaaa y otros como aaaa-mm-dd.
+        # Indicar el formato exacto evita que pandas tenga que adivinarlo
+        # y que confunda el día con el mes.
+        fechas = df["FECHA_SIGN_SINTOMAS"]
+        formato = "%d/%m/%Y" if "/" in fechas.iloc[0] else "%Y-%m-%d"
+        df["FECHA_SIGN_SINTOMAS"] = pd.to_datetime(fechas, format=formato, cache=True)
+
+        guardar_archivo(
+            ruta, lambda temporal: df.to_parquet(temporal, compression="zstd")
+        )
+
+    return pd.read_parquet(ruta, columns=columnas, filters=filtros)
+
+
+def cargar_geojson(ruta):
+    """
+    Carga un archivo GeoJSON usando orjson, el cual es varias veces
+    más rápido que el módulo json de la biblioteca estándar.
+
+    El resultado se guarda junto al archivo original con la extensión
+    '.pkl', así las siguientes lecturas se saltan el JSON por completo.
+    Si el GeoJSON es más reciente que esa copia, se vuelve a generar.
+
+    Parameters
+    ----------
+    ruta: str
+        La ruta del archivo GeoJSON.
+
+    Returns
+    -------
+    dict
+        El GeoJSON como un diccionario.
+
+    """
+
+    ruta_pickle = f"{ruta}.pkl"
+    actualizado = os.path.exists(ruta_pickle) and (
+        os.path.getmtime(ruta_pickle) >= os.path.getmtime(ruta)
+    )
+
+    # El GeoJSON municipal crea millones de listas, lo cual dispara el recolector
+    # de basura una y otra vez sin liberar nada. Lo pausamos mientras cargamos.
+    # La mayor parte de la mejora viene de aquí; la copia en pickle solo se
+    # carga un poco más rápido que orjson con el recolector pausado.
+    recolector_activo = gc.isenabled()
+    gc.disable()
+
+    try:
+        if actualizado:
+            with open(ruta_pickle, "rb") as archivo:
+                return pickle.load(archivo)
+
+        with open(ruta, "rb") as archivo:
+            geojson = orjson.loads(archivo.read())
+    finally:
+        if recolector_activo:
+            gc.enable()
+
+    def escribir(temporal):
+        with open(temporal, "wb") as archivo:
+            pickle.dump(geojson, archivo, protocol=5)
+
+    guardar_archivo(ruta_pickle, escribir)
+
+    return geojson
+
+
+def cargar_agregado(nombre, año, calcular, fuentes=()):
+    """
+    Carga un resultado intermedio guardado en './cache' como Parquet.
+    Si no existe o alguno de sus archivos fuente es más reciente,
+    se vuelve a calcular y se guarda para las siguientes lecturas.
+
+    Parameters
+    ----------
+    nombre: str
+        El nombre del resultado, por ejemplo 'municipal'.
+
+    año: int
+        El año del dataset de dengue a partir del cual se calcula.
+
+    calcular: callable
+        La función que calcula el resultado. Recibe el año y
+        debe regresar un DataFrame.
+
+    fuentes: list, optional
+        Otros archivos de los que depende el resultado, además del CSV
+        de dengue del año, como los datasets de población.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El resultado intermedio.
+
+    """
+
+    ruta = f"./cache/{nombre}_{año}.parquet"
+    fuentes = [f"./data/{año}.csv", *fuentes]
+
+    actualizado = os.path.exists(ruta) and all(
+        os.path.getmtime(ruta) >= os.path.getmtime(fuente)
+        for fuente in fuentes
+        if os.path.exists(fuente)
+    )
+
+    if actualizado:
+        return pd.read_parquet(ruta)
+
+    df = calcular(año)
+
+    os.makedirs("./cache", exist_ok=True)
+    guardar_archivo(ruta, lambda temporal: df.to_parquet(temporal, compression="zstd"))
+
+    return df
@@ -10,6 +10,10 @@ import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from datos import cargar_dataset, configurar_kaleido
+
+configurar_kaleido()
+
 
 # Estas abreviaciones son usadas para las etiquetas arriba del calenario.
 MESES_ABREVIACIONES = [
@@ -54,6 +58,12 @@ DIAS_DICT = {
     6: "Dom.",
 }
 
+# Ancho y márgenes horizontales del lienzo, en pixeles.
+# Los usamos también para calcular el tamaño de las celdas del calendario.
+ANCHO = 1280
+MARGEN_IZQUIERDO = 90
+MARGEN_DERECHO = 140
+
 
 def main(año):
     """
@@ -69,24 +79,28 @@ def main(año):
 
     # Cargamos el dataset de dengue del año que nos interesa.
     # Seleccinamos la columna de 'FECHA_SIGN_SINTOMAS' como nuestro índice.
-    df = pd.read_csv(
-        f"./data/{año}.csv",
-        parse_dates=["FECHA_SIGN_SINTOMAS"],
-        index_col="FECHA_SIGN_SINTOMAS",
-    )
-
+    # Solo leemos las columnas que vamos a utilizar.
     # IMPORTANTE: Solo seleccionamos casos confirmados.
-    df = df[df["ESTATUS_CASO"] == 2]
+    df = cargar_dataset(
+        año, ["FECHA_SIGN_SINTOMAS"], filtros=[("ESTATUS_CASO", "==", 2)]
+    )
+    df = df.set_index("FECHA_SIGN_SINTOMAS")
 
     # Contamos que mes tuvo más registros.
     mes_max = df.index.month.value_counts()[:1]
 
     # Contamos los totales por día.
-    # El método 'resample' es bastante útil al tener un índice tipo DateTimeIndex.
-    totales_por_dia = df.resample("D").count()["ESTATUS_CASO"]
+    # No ordenamos por conteo ya que después ordenamos por fecha.
+    # Los días sin registros entre el primer y último registro se quedan en cero.
+    totales_por_dia = df.index.normalize().value_counts(sort=False).sort_index()
+    totales_por_dia = totales_por_dia.reindex(
+        pd.date_range(totales_por_dia.index[0], totales_por_dia.index[-1]),
+        fill_value=0,
+    )
 
     # Creamos el cascarón de un DataFrame para todos los días del año de interés.
     # Después le asignamos los valores de los totales recién calculados.
+    # Los días fuera del rango de registros se quedan vacíos en el calendario.
     final = pd.DataFrame(
         index=pd.date_range(f"{año}-01-01", f"{año}-12-31"),
         data={"total": totales_por_dia},
@@ -95,15 +109,12 @@ def main(año):
     # Determinamos los valores mínimos y máximos para nuestra escala.
     # Para el valor máximo usamos el 95 percentil para mitigar los
     # efectos de valores atípicos.
-    valor_min = final["total"].min()
-    valor_max = final["total"].quantile(0.95)
+    valor_min = np.nanmin(final["total"].to_numpy())
+    valor_max = np.nanquantile(final["total"].to_numpy(), 0.95)
 
     # Vamos a crear nuestra escala con 9 intervalos.
-    marcas = np.linspace(valor_min, valor_max, 9)
-    etiquetas = list()
-
-    for marca in marcas:
-        etiquetas.append(f"{marca:,.0f}")
+    marcas = np.linspace(valor_min, valor_max, 9).tolist()
+    etiquetas = [f"{marca:,.0f}" for marca in marcas]
 
     # A la última etiqueta le agregamos el símbolo de 'mayor o igual que'.
     etiquetas[-1] = f"≥{etiquetas[-1]}"
@@ -119,13 +130,6 @@ def main(año):
     # No podemos usar la propiedad 'week' del objeto DateTime ya que nos
     # devuelve la del calendario Gregoriano (que puede ser del año anterior).
 
-    # Vamos a crear una lista que nos da 7 veces el número de semana
-    # para 54 semanas.
-    numero_semana = list()
-
-    for semana in range(54):
-        numero_semana.extend([semana for _ in range(7)])
-
     # Creamos una columna con el día de la semana.
     # Donde 0 es lunes y 6 es domingo.
     final["dayofweek"] = final.index.dayofweek
@@ -133,14 +137,11 @@ def main(año):
     # Para determinar el número de semana de tada día
     # debemos ajustar desde el primer día del año (semana 0).
     # Pero no todos los años comienzan en lunes.
-    # Lo que hacemos es recortar nuestra lista de numero de semana
-    # exactamente donde comienza el año y donde termina y el
-    # resultado se agrega a una nueva columna en el DataFrame.
+    # Lo que hacemos es recorrer la posición de cada día tantos lugares
+    # como días hay entre el lunes y el primer día del año, y después
+    # dividimos entre 7 para obtener su número de semana.
     pad = final.index[0].dayofweek
-    final["semana"] = numero_semana[pad : len(final) + pad]
-
-    # En nuestro calendario, el primer día de cada mes tendrá un borde para distinguirlo.
-    final["borde"] = final.index.map(lambda x: 1 if x.day == 1 else 0)
+    final["semana"] = (np.arange(len(final)) + pad) // 7
 
     # Calculamos algunas estadísticas que irán debajo del calendario.
     stats_max = f"{final['total'].max():,.0f} el {final['total'].idxmax():%d/%m/%Y}"
@@ -152,7 +153,7 @@ def main(año):
     marcas_meses = np.linspace(1.5, 49.5, 12)
 
     # Vamos a crear un lienzo con tres elmentos:
-    # (2) Heatmaps sobrepuestos y (1) Table
+    # (1) Heatmap, (1) Scatter sobrepuesto y (1) Table
     fig = make_subplots(
         rows=2,
         cols=1,
@@ -161,25 +162,7 @@ def main(año):
         specs=[[{"type": "scatter"}], [{"type": "table"}]],
     )
 
-    # El primer Heatmap va a tener un solo proposito y es el
-    # de mostrar el borde en el primer día de cada mes.
-    # Es importante poner atención en los parámetros 'gap', ya que
-    # el borde es un truco visual.
-    fig.add_trace(
-        go.Heatmap(
-            x=final["semana"],
-            y=final["dayofweek"],
-            z=final["borde"],
-            xgap=1,
-            ygap=12,
-            colorscale=["hsla(0, 100%, 100%, 0.0)", "hsla(0, 100%, 100%, 1.0)"],
-            showscale=False,
-        ),
-        col=1,
-        row=1,
-    )
-
-    # Este heatmap va a mostrar los valores de cada día.
+    # El heatmap va a mostrar los valores de cada día.
     # Está configurado con la mayoría de variables que definimos anteriormente.
     fig.add_trace(
         go.Heatmap(
@@ -211,6 +194,37 @@ def main(año):
         row=1,
     )
 
+    # Sobre el heatmap dibujamos un cuadro sin relleno en el primer día
+    # de cada mes. Al ser solo 12 marcadores, es mucho más ligero que
+    # un segundo heatmap para todo el año.
+    primeros_dias = final[final.index.is_month_start]
+
+    # El tamaño de los marcadores es fijo en pixeles, así que lo calculamos
+    # a partir de la distancia entre columnas del eje horizontal.
+    # Al igual que el heatmap de bordes anterior (xgap=1), el cuadro mide
+    # 1 pixel menos que esa distancia, y al restarle el grosor de la línea
+    # su interior coincide con el ancho de la celda (xgap=5).
+    semanas = final["semana"].max() + 2
+    paso = (ANCHO - MARGEN_IZQUIERDO - MARGEN_DERECHO) / semanas
+    grosor_borde = 2
+    tamaño_borde = paso - 1 - grosor_borde
+
+    fig.add_trace(
+        go.Scatter(
+            x=primeros_dias["semana"],
+            y=primeros_dias["dayofweek"],
+            mode="markers",
+            marker_symbol="square-open",
+            marker_color="#FFFFFF",
+            marker_size=tamaño_borde,
+            marker_line_width=grosor_borde,
+            hoverinfo="skip",
+            showlegend=False,
+        ),
+        col=1,
+        row=1,
+    )
+
     # Agregamos una sencilla tabla con las estadísticas que calculamos anteriormente.
     fig.add_trace(
         go.Table(
@@ -284,7 +298,7 @@ def main(año):
     # Un poco más de personalización y agregamos las anotaciones correspondientes.
     fig.update_layout(
         showlegend=False,
-        width=1280,
+        width=ANCHO,
         height=533,
         font_family="Quicksand",
         font_color="#FFFFFF",
@@ -293,9 +307,9 @@ def main(año):
         title_x=0.5,
         title_y=0.93,
         margin_t=120,
-        margin_r=140,
+        margin_r=MARGEN_DERECHO,
         margin_b=0,
-        margin_l=90,
+        margin_l=MARGEN_IZQUIERDO,
         title_font_size=30,
         plot_bgcolor="#041C32",
         paper_bgcolor="#04293A",
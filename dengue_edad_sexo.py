@@ -7,9 +7,19 @@ HOMBRE: 2
 
 """
 
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from datos import cargar_dataset, configurar_kaleido
+
+# Al importarse en cada proceso del ProcessPoolExecutor, cada uno
+# configura su propia instancia de Kaleido.
+configurar_kaleido()
+
 
 # El dataset de dengue no cuenta con grupos de edad,
 # nosotros tendremos que definirlos.
@@ -34,66 +44,109 @@ BINS = [
     (85, 120),
 ]
 
+# Las etiquetas de los grupos de edad se calculan una sola vez.
+# Para el último grupo de edad le agregamos el símbolo de 'mayor o igual que'
+# para que coincida con el índice de los datasets de población quinquenal.
+ETIQUETAS_EDAD = [f"{a}-{b}" if a < 85 else "≥85" for a, b in BINS]
 
-def infecciones(año):
+
+@functools.lru_cache(maxsize=None)
+def cargar_poblacion(año):
     """
-    Crea una gráfica de dispersión donde se muestra el grupo de edad
-    y sexo de las personas infectadas por dengue en México.
+    Carga la población de hombres y mujeres por edad quinquenal de un año.
+    El resultado se guarda en memoria, lo cual solo ayuda cuando infecciones()
+    y defunciones() se llaman en el mismo intérprete. Al ejecutar este script,
+    cada función corre en su propio proceso y lee los archivos una vez.
 
     Parameters
     ----------
     año: int
-        El año que se desea graficar.
+        El año de la población que se desea cargar.
+
+    Returns
+    -------
+    pandas.DataFrame
+        La población por grupo de edad (índice), con las columnas
+        'poblacion_hombres' y 'poblacion_mujeres'.
+        No debe modificarse, ya que es compartido entre llamadas.
 
     """
 
-    # Cargamos el dataset de dengue del año que nos interesa.
-    df = pd.read_csv(f"./data/{año}.csv")
+    # Seleccionamos la población del año que nos interesa de cada dataset.
+    hombres = pd.read_csv("./assets/poblacion_quinquenal/hombres.csv", index_col=0)
+    mujeres = pd.read_csv("./assets/poblacion_quinquenal/mujeres.csv", index_col=0)
 
-    # IMPORTANTE: Solo seleccionamos casos confirmados.
-    df = df[df["ESTATUS_CASO"] == 2]
-
-    data = list()
-
-    # Iteramos sobre todos nuestros grupos de edad y contamos los registros
-    # para cada uno.
-    for a, b in BINS:
-        temp_mujeres = df[(df["SEXO"] == 1) & (df["EDAD_ANOS"].between(a, b))]
-        temp_hombres = df[(df["SEXO"] == 2) & (df["EDAD_ANOS"].between(a, b))]
-
-        # Para el último grupo de edad le agregamos el símbolo de 'mayor o igual que'
-        # para que coincida con el índice de los datasets de población quinquenal.
-        data.append(
-            {
-                "edad": f"{a}-{b}" if a < 85 else "≥85",
-                "mujeres": len(temp_mujeres),
-                "hombres": len(temp_hombres),
-            }
-        )
+    return pd.concat(
+        [
+            hombres[str(año)].rename("poblacion_hombres"),
+            mujeres[str(año)].rename("poblacion_mujeres"),
+        ],
+        axis=1,
+    )
 
-    # Creamos un DataFrame con los conteos de cada grupo de edad y sexo.
-    final = pd.DataFrame.from_records(data, index="edad")
 
-    # cargamos el dataset de la población de hombres por edad quinquenal.
-    hombres_pop = pd.read_csv("./assets/poblacion_quinquenal/hombres.csv", index_col=0)
+def crear_figura(df, año, titulo, rango_y, leyenda_x, leyenda_xanchor):
+    """
+    Crea la gráfica de dispersión con las tasas por grupo de edad y sexo
+    a partir de los registros ya filtrados.
 
-    # Seleccionamos la población del año que nos interesa.
-    hombres_pop = hombres_pop[str(año)]
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Los registros a contar, con las columnas 'SEXO' y 'EDAD_ANOS'.
 
-    # Agregamos la columna de población de hombres.
-    final["poblacion_hombres"] = hombres_pop
+    año: int
+        El año de la población que se usará para calcular las tasas.
 
-    # calculamos la tasa por cada 100k hombres para cada grupo de edad.
-    final["tasa_hombres"] = final["hombres"] / final["poblacion_hombres"] * 100000
+    titulo: str
+        El título de la gráfica.
+
+    rango_y: float
+        El valor mínimo del eje vertical.
+
+    leyenda_x: float
+        La posición horizontal de la leyenda.
 
-    # cargamos el dataset de la población de mujeres por edad quinquenal.
-    mujeres_pop = pd.read_csv("./assets/poblacion_quinquenal/mujeres.csv", index_col=0)
+    leyenda_xanchor: str
+        El ancla horizontal de la leyenda ('left' o 'right').
 
-    # Seleccionamos la población del año que nos interesa.
-    mujeres_pop = mujeres_pop[str(año)]
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para ser exportada.
 
-    # Agregamos la columna de población de mujeres.
-    final["poblacion_mujeres"] = mujeres_pop
+    """
+
+    edades = df["EDAD_ANOS"].to_numpy(np.int16)
+    sexos = df["SEXO"].to_numpy(np.int8)
+
+    # Descartamos las edades fuera del rango de nuestros grupos de edad
+    # y los registros con un sexo distinto a 1 o 2.
+    validos = (edades >= 0) & (edades <= BINS[-1][1]) & ((sexos == 1) | (sexos == 2))
+    edades = edades[validos]
+    sexos = sexos[validos]
+
+    # Todos los grupos de edad son de 5 años, por lo que basta con una
+    # división entera para saber a cuál pertenece cada registro.
+    # Las personas de 85 años o más quedan en el último grupo.
+    grupos_edad = np.minimum(edades // 5, len(BINS) - 1)
+
+    # Contamos los registros para cada sexo y grupo de edad en una sola pasada.
+    # La primera fila es de mujeres (1) y la segunda de hombres (2).
+    conteo = np.zeros((2, len(BINS)), dtype=np.int64)
+    np.add.at(conteo, (sexos - 1, grupos_edad), 1)
+
+    # Creamos un DataFrame con los conteos de cada grupo de edad y sexo.
+    final = pd.DataFrame(
+        {"mujeres": conteo[0], "hombres": conteo[1]},
+        index=pd.Index(ETIQUETAS_EDAD, name="edad"),
+    )
+
+    # Agregamos las columnas de población de hombres y mujeres.
+    final = final.join(cargar_poblacion(año))
+
+    # calculamos la tasa por cada 100k hombres para cada grupo de edad.
+    final["tasa_hombres"] = final["hombres"] / final["poblacion_hombres"] * 100000
 
     # calculamos la tasa por cada 100k mujeres para cada grupo de edad.
     final["tasa_mujeres"] = final["mujeres"] / final["poblacion_mujeres"] * 100000
@@ -147,7 +200,7 @@ def infecciones(año):
 
     fig.update_yaxes(
         title="Tasa por cada 100,000 hombres/mujeres dentro del grupo de edad",
-        range=[-4, None],
+        range=[rango_y, None],
         ticks="outside",
         separatethousands=True,
         titlefont_size=18,
@@ -169,9 +222,9 @@ def infecciones(año):
         legend_itemsizing="constant",
         legend_borderwidth=1,
         legend_bordercolor="#FFFFFF",
-        legend_x=0.99,
+        legend_x=leyenda_x,
         legend_y=0.98,
-        legend_xanchor="right",
+        legend_xanchor=leyenda_xanchor,
         legend_yanchor="top",
         legend_font_size=16,
         width=1280,
@@ -179,7 +232,7 @@ def infecciones(año):
         font_family="Quicksand",
         font_color="#FFFFFF",
         font_size=18,
-        title_text=f"Incidencia de dengue en México durante el {año} según sexo y grupo de edad",
+        title_text=titulo,
         title_x=0.5,
         title_y=0.965,
         margin_t=60,
@@ -220,10 +273,10 @@ def infecciones(año):
         ],
     )
 
-    fig.write_image(f"./infecciones_edades_{año}.png")
+    return fig
 
 
-def defunciones(año):
+def infecciones(año):
     """
     Crea una gráfica de dispersión donde se muestra el grupo de edad
     y sexo de las personas infectadas por dengue en México.
@@ -236,182 +289,58 @@ def defunciones(año):
     """
 
     # Cargamos el dataset de dengue del año que nos interesa.
-    df = pd.read_csv(f"./data/{año}.csv")
-
-    # IMPORTANTE: Solo seleccionamos defuncoines confirmadas.
-    df = df[df["DICTAMEN"] == 1]
-
-    data = list()
-
-    # Iteramos sobre todos nuestros grupos de edad y contamos los registros
-    # para cada uno.
-    for a, b in BINS:
-        temp_mujeres = df[(df["SEXO"] == 1) & (df["EDAD_ANOS"].between(a, b))]
-        temp_hombres = df[(df["SEXO"] == 2) & (df["EDAD_ANOS"].between(a, b))]
-
-        # Para el último grupo de edad le agregamos el símbolo de 'mayor o igual que'
-        # para que coincida con el índice de los datasets de población quinquenal.
-        data.append(
-            {
-                "edad": f"{a}-{b}" if a < 85 else "≥85",
-                "mujeres": len(temp_mujeres),
-                "hombres": len(temp_hombres),
-            }
-        )
-
-    # Creamos un DataFrame con los conteos de cada grupo de edad y sexo.
-    final = pd.DataFrame.from_records(data, index="edad")
-
-    # cargamos el dataset de la población de hombres por edad quinquenal.
-    hombres_pop = pd.read_csv("./assets/poblacion_quinquenal/hombres.csv", index_col=0)
-
-    # Seleccionamos la población del año que nos interesa.
-    hombres_pop = hombres_pop[str(año)]
-
-    # Agregamos la columna de población de hombres.
-    final["poblacion_hombres"] = hombres_pop
-
-    # calculamos la tasa por cada 100k hombres para cada grupo de edad.
-    final["tasa_hombres"] = final["hombres"] / final["poblacion_hombres"] * 100000
-
-    # cargamos el dataset de la población de mujeres por edad quinquenal.
-    mujeres_pop = pd.read_csv("./assets/poblacion_quinquenal/mujeres.csv", index_col=0)
-
-    # Seleccionamos la población del año que nos interesa.
-    mujeres_pop = mujeres_pop[str(año)]
+    # Solo leemos las columnas que vamos a utilizar.
+    # IMPORTANTE: Solo seleccionamos casos confirmados.
+    df = cargar_dataset(año, ["SEXO", "EDAD_ANOS"], filtros=[("ESTATUS_CASO", "==", 2)])
+
+    fig = crear_figura(
+        df,
+        año,
+        titulo=f"Incidencia de dengue en México durante el {año} según sexo y grupo de edad",
+        rango_y=-4,
+        leyenda_x=0.99,
+        leyenda_xanchor="right",
+    )
 
-    # Agregamos la columna de población de mujeres.
-    final["poblacion_mujeres"] = mujeres_pop
+    fig.write_image(f"./infecciones_edades_{año}.png")
 
-    # calculamos la tasa por cada 100k mujeres para cada grupo de edad.
-    final["tasa_mujeres"] = final["mujeres"] / final["poblacion_mujeres"] * 100000
 
-    # Vamos a crear dos gráficas de dispersión para comparar las tasas
-    # de hombres y mujeres.
-    fig = go.Figure()
-
-    # Agregamos la gráfica de dispersión para hombres.
-    fig.add_trace(
-        go.Scatter(
-            x=final.index,
-            y=final["tasa_hombres"],
-            mode="markers",
-            name=f"<b>Hombres</b><br>{final['hombres'].sum():,.0f} registros",
-            marker_color="#76ff03",
-            marker_symbol="circle-open",
-            marker_size=24,
-            marker_line_width=4,
-        )
-    )
-
-    # Agregamos la gráfica de dispersión para mujeres.
-    fig.add_trace(
-        go.Scatter(
-            x=final.index,
-            y=final["tasa_mujeres"],
-            mode="markers",
-            name=f"<b>Mujeres</b><br>{final['mujeres'].sum():,.0f} registros",
-            marker_color="#ea80fc",
-            marker_symbol="diamond-open",
-            marker_size=24,
-            marker_line_width=4,
-        )
-    )
+def defunciones(año):
+    """
+    Crea una gráfica de dispersión donde se muestra el grupo de edad
+    y sexo de las personas infectadas por dengue en México.
 
-    fig.update_xaxes(
-        range=[-0.7, len(final) - 0.3],
-        ticks="outside",
-        tickfont_size=14,
-        ticklen=10,
-        zeroline=False,
-        tickcolor="#FFFFFF",
-        linewidth=2,
-        showline=True,
-        showgrid=True,
-        gridwidth=0.5,
-        mirror=True,
-        nticks=30,
-    )
+    Parameters
+    ----------
+    año: int
+        El año que se desea graficar.
 
-    fig.update_yaxes(
-        title="Tasa por cada 100,000 hombres/mujeres dentro del grupo de edad",
-        range=[0, None],
-        ticks="outside",
-        separatethousands=True,
-        titlefont_size=18,
-        tickfont_size=14,
-        ticklen=10,
-        title_standoff=6,
-        tickcolor="#FFFFFF",
-        linewidth=2,
-        gridwidth=0.5,
-        showline=True,
-        nticks=20,
-        zeroline=True,
-        mirror=True,
-    )
+    """
 
-    # Personalizamos la leyenda y agregamos las anotaciones correspondientes.
-    fig.update_layout(
-        showlegend=True,
-        legend_itemsizing="constant",
-        legend_borderwidth=1,
-        legend_bordercolor="#FFFFFF",
-        legend_x=0.01,
-        legend_y=0.98,
-        legend_xanchor="left",
-        legend_yanchor="top",
-        legend_font_size=16,
-        width=1280,
-        height=720,
-        font_family="Quicksand",
-        font_color="#FFFFFF",
-        font_size=18,
-        title_text=f"Defunciones por dengue en México durante el {año} según sexo y grupo de edad",
-        title_x=0.5,
-        title_y=0.965,
-        margin_t=60,
-        margin_r=40,
-        margin_b=85,
-        margin_l=80,
-        title_font_size=22,
-        plot_bgcolor="#041C32",
-        paper_bgcolor="#04293A",
-        annotations=[
-            dict(
-                x=0.01,
-                y=-0.13,
-                xref="paper",
-                yref="paper",
-                xanchor="left",
-                yanchor="top",
-                text="Fuente: SSA (20/11/2024)",
-            ),
-            dict(
-                x=0.5,
-                y=-0.13,
-                xref="paper",
-                yref="paper",
-                xanchor="center",
-                yanchor="top",
-                text="Grupo de edad al momento de la infección",
-            ),
-            dict(
-                x=1.01,
-                y=-0.13,
-                xref="paper",
-                yref="paper",
-                xanchor="right",
-                yanchor="top",
-                text="🧁 @lapanquecita",
-            ),
-        ],
+    # Cargamos el dataset de dengue del año que nos interesa.
+    # Solo leemos las columnas que vamos a utilizar.
+    # IMPORTANTE: Solo seleccionamos defuncoines confirmadas.
+    df = cargar_dataset(año, ["SEXO", "EDAD_ANOS"], filtros=[("DICTAMEN", "==", 1)])
+
+    fig = crear_figura(
+        df,
+        año,
+        titulo=f"Defunciones por dengue en México durante el {año} según sexo y grupo de edad",
+        rango_y=0,
+        leyenda_x=0.01,
+        leyenda_xanchor="left",
     )
 
     fig.write_image(f"./defunciones_edades_{año}.png")
 
 
-
 if __name__ == "__main__":
-    infecciones(2024)
-    defunciones(2024)
+    # Ambas gráficas son independientes entre sí, por lo que
+    # las creamos al mismo tiempo en procesos separados.
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        tareas = [
+            executor.submit(funcion, 2024) for funcion in (infecciones, defunciones)
+        ]
+
+        for tarea in tareas:
+            tarea.result()
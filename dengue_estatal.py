@@ -7,8 +7,7 @@ HOMBRE: 2
 
 """
 
-import json
-import os
+import io
 
 import numpy as np
 import pandas as pd
@@ -16,6 +15,8 @@ import plotly.graph_objects as go
 from PIL import Image
 from plotly.subplots import make_subplots
 
+from datos import cargar_dataset, cargar_geojson
+
 # Este diccionario es utilizado para convertir los
 # identificadores de cada entidad a su nomre común.
 ENTIDADES = {
@@ -53,6 +54,60 @@ ENTIDADES = {
     32: "Zacatecas",
 }
 
+# Los mismos nombres en un arreglo, donde la posición 0 es la entidad 1.
+# Nos permite renombrar un índice de identificadores sin recorrerlo en Python.
+ENTIDADES_ARR = np.array(list(ENTIDADES.values()), dtype=object)
+
+
+def crear_tabla(df):
+    """
+    Crea una tabla con los registros y la tasa de cada entidad.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Las entidades (índice) a mostrar, con las columnas 1 (mujeres),
+        2 (hombres), 'total' y 'tasa'.
+
+    Returns
+    -------
+    plotly.graph_objects.Table
+        La tabla lista para agregarse a un subplot.
+
+    """
+
+    return go.Table(
+        columnwidth=[130, 70, 70, 70, 95],
+        header=dict(
+            values=[
+                "<b>Entidad</b>",
+                "<b>Hombres</b>",
+                "<b>Mujeres</b>",
+                "<b>Total</b>",
+                "<b>100k habs. ↓</b>",
+            ],
+            font_color="#FFFFFF",
+            fill_color="#f4511e",
+            align="center",
+            height=29.8,
+            line_width=0.8,
+        ),
+        cells=dict(
+            values=[
+                df.index,
+                df[2],
+                df[1],
+                df["total"],
+                df["tasa"],
+            ],
+            fill_color="#041C32",
+            height=29.8,
+            format=["", ",", ",", ",", ",.2f"],
+            line_width=0.8,
+            align=["left", "center"],
+        ),
+    )
+
 
 def main(año):
     """
@@ -83,10 +138,11 @@ def main(año):
     )
 
     # Cargamos el dataset de dengue del año que nos interesa.
-    df = pd.read_csv(f"./data/{año}.csv")
-
+    # Solo leemos las columnas que vamos a utilizar.
     # IMPORTANTE: Solo seleccionamos casos confirmados.
-    df = df[df["ESTATUS_CASO"] == 2]
+    df = cargar_dataset(
+        año, ["ENTIDAD_RES", "SEXO"], filtros=[("ESTATUS_CASO", "==", 2)]
+    )
 
     # Calculamos algunos totales para el subtítulo.
     total_nacional = len(df)
@@ -100,29 +156,16 @@ def main(año):
 
     # Transformamos el DataFrame para darnos el total de casos confirmados
     # por entidad y sexo.
-    # df = df.pivot_table(index="ENTIDAD_RES", columns="SEXO", aggfunc="count").fillna(0)[
-    #    "EDAD_ANOS"
-    # ]
-
-    df = df.pivot_table(
-        index="ENTIDAD_RES",
-        columns="SEXO",
-        values="EDAD_ANOS",
-        aggfunc="count",
-        fill_value=0,
-    )
+    # No ordenamos los grupos ya que más adelante ordenamos por la tasa.
+    df = df.groupby(["ENTIDAD_RES", "SEXO"], sort=False).size().unstack(fill_value=0)
 
-    # Creamos un DataFrame n ceros. En ocasiones algunos estados
-    # no tienen valores y necesitamos predefinirlos.
-    dummy = pd.DataFrame(index=range(1, 33), data={1: 0, 2: 0})
-
-    # Actualizamos los valores del DataFrame en ceros y
-    # lo reasignamos al DataFrame original.
-    dummy.update(df)
-    df = dummy
+    # En ocasiones algunos estados (o un sexo) no tienen registros,
+    # así que completamos las 32 entidades y ambos sexos con ceros.
+    # De esta forma los conteos se mantienen como enteros.
+    df = df.reindex(index=range(1, 33), columns=[1, 2], fill_value=0)
 
     # Renombramos el índice con los nombres de las entidades.
-    df.index = df.index.map(ENTIDADES)
+    df.index = pd.Index(ENTIDADES_ARR[df.index.to_numpy() - 1], name="entidad")
 
     # Creamos una nueva columna con el total por entidad.
     df["total"] = df.sum(axis=1)
@@ -153,20 +196,14 @@ def main(año):
     etiquetas[-1] = f"≥{etiquetas[-1]}"
 
     # Cargamos el GeoJSON de México.
-    geojson = json.load(open("./assets/mexico.json", "r", encoding="utf-8"))
+    geojson = cargar_geojson("./assets/mexico.json")
 
     # Estas listas serán usadas para configurar el mapa Choropleth.
-    ubicaciones = list()
-    valores = list()
-
-    # Iteramos sobre las entidades dentro del GeoJSON.
-    for item in geojson["features"]:
-        # Extraemos el nombre de la entidad.
-        geo = item["properties"]["NOMGEO"]
-
-        # Agregamos el objeto de la entidad y su valor a las listas correspondientes.
-        ubicaciones.append(geo)
-        valores.append(df.loc[geo, "tasa"])
+    # Extraemos el nombre de cada entidad dentro del GeoJSON y buscamos
+    # su tasa en un diccionario, lo cual es mucho más rápido que usar 'loc'.
+    tasas = df["tasa"].to_dict()
+    ubicaciones = [item["properties"]["NOMGEO"] for item in geojson["features"]]
+    valores = [tasas.get(geo) for geo in ubicaciones]
 
     fig = go.Figure()
 
@@ -274,8 +311,8 @@ def main(año):
         ],
     )
 
-    # Exportamos nuestro mapa a un archivo PNG.
-    fig.write_image("./1.png")
+    # Exportamos nuestro mapa a PNG en memoria, sin escribirlo a disco.
+    imagen1 = Image.open(io.BytesIO(fig.to_image(format="png")))
 
     # Ahora sigue crear la tabla que irá debajo del mapa.
     # Creamos un lienzo con dos subplots de tipo Table.
@@ -287,79 +324,10 @@ def main(año):
     )
 
     # Crear las tablas solo es cuestión de definir las columnas y sus
-    # contenidos. Es importante notar en que columna y fila dentro de la
-    # cuadrícula de subplots se coloca cada tabla.
-    fig.add_trace(
-        go.Table(
-            columnwidth=[130, 70, 70, 70, 95],
-            header=dict(
-                values=[
-                    "<b>Entidad</b>",
-                    "<b>Hombres</b>",
-                    "<b>Mujeres</b>",
-                    "<b>Total</b>",
-                    "<b>100k habs. ↓</b>",
-                ],
-                font_color="#FFFFFF",
-                fill_color="#f4511e",
-                align="center",
-                height=29.8,
-                line_width=0.8,
-            ),
-            cells=dict(
-                values=[
-                    df.index[:16],
-                    df[2][:16],
-                    df[1][:16],
-                    df["total"][:16],
-                    df["tasa"][:16],
-                ],
-                fill_color="#041C32",
-                height=29.8,
-                format=["", ",", ",", ",", ",.2f"],
-                line_width=0.8,
-                align=["left", "center"],
-            ),
-        ),
-        col=1,
-        row=1,
-    )
-
-    fig.add_trace(
-        go.Table(
-            columnwidth=[130, 70, 70, 70, 95],
-            header=dict(
-                values=[
-                    "<b>Entidad</b>",
-                    "<b>Hombres</b>",
-                    "<b>Mujeres</b>",
-                    "<b>Total</b>",
-                    "<b>100k habs. ↓</b>",
-                ],
-                font_color="#FFFFFF",
-                fill_color="#f4511e",
-                align="center",
-                height=29.8,
-                line_width=0.8,
-            ),
-            cells=dict(
-                values=[
-                    df.index[16:],
-                    df[2][16:],
-                    df[1][16:],
-                    df["total"][16:],
-                    df["tasa"][16:],
-                ],
-                fill_color="#041C32",
-                height=29.8,
-                format=["", ",", ",", ",", ",.2f"],
-                line_width=0.8,
-                align=["left", "center"],
-            ),
-        ),
-        col=2,
-        row=1,
-    )
+    # contenidos. Las primeras 16 entidades van en la columna izquierda
+    # de la cuadrícula de subplots y el resto en la derecha.
+    for columna, filas in enumerate([slice(None, 16), slice(16, None)], start=1):
+        fig.add_trace(crear_tabla(df.iloc[filas]), col=columna, row=1)
 
     # Ajustamos el lienzo de las tablas.
     fig.update_layout(
@@ -376,13 +344,10 @@ def main(año):
         paper_bgcolor="#04293A",
     )
 
-    # Exportamos las tablas a un archivo PNG.
-    fig.write_image("./2.png")
+    # Exportamos las tablas a PNG en memoria.
+    imagen2 = Image.open(io.BytesIO(fig.to_image(format="png")))
 
     # Vamos a usar la librería Pillow para unir ambas imágenes.
-    # Primero cargamos las dos imágenes recién creadas.
-    imagen1 = Image.open("./1.png")
-    imagen2 = Image.open("./2.png")
 
     # Calculamos el ancho y alto final de nuestra imagen.
     resultado_ancho = imagen1.width
@@ -393,12 +358,9 @@ def main(año):
     resultado.paste(im=imagen1, box=(0, 0))
     resultado.paste(im=imagen2, box=(0, imagen1.height))
 
-    # Exportamos la nueva imagen unida y borramos las originales.
+    # Exportamos la nueva imagen unida.
     resultado.save(f"./estatal_{año}.png")
 
-    os.remove("./1.png")
-    os.remove("./2.png")
-
 
 if __name__ == "__main__":
     main(2023)
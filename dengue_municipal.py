@@ -1,63 +1,153 @@
-import json
-
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from datos import cargar_agregado, cargar_dataset, cargar_geojson
+
 
-def mapa_municipios(año):
+def crear_cve(df):
     """
-    Crea un mapa Choropleth de casos confirmados
-     de dengue en México por municipio.
+    Calcula la clave de cada municipio (CVE) como número entero.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Los registros con las columnas 'ENTIDAD_RES' y 'MUNICIPIO_RES'.
+
+    Returns
+    -------
+    numpy.ndarray
+        La clave de entidad y municipio, por ejemplo 1001 para 01001.
+
+    """
+
+    # Usamos int32 para que la multiplicación no se desborde.
+    entidad = df["ENTIDAD_RES"].to_numpy(np.int32)
+    municipio = df["MUNICIPIO_RES"].to_numpy(np.int32)
+
+    return entidad * 1000 + municipio
+
+
+def preparar_municipios(año):
+    """
+    Carga los casos confirmados, la población y la tasa de cada municipio.
+    El resultado es compartido por el mapa y la tabla de municipios y se
+    guarda en './cache', así solo se recalcula cuando cambian los datos.
 
     Parameters
     ----------
     año: int
-        El año que se desea graficar.
+        El año que se desea calcular.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Los municipios (índice CVE como entero) con las columnas 'entidad',
+        'municipio', 'poblacion', 'total' y 'tasa'. Los municipios sin
+        registros tienen un total de 0 y las claves sin población un valor nulo.
 
     """
 
-    # El índice lo vamos a necesitar como cadena.
-    pop_types = {"CVE": str}
+    return cargar_agregado(
+        "municipal",
+        año,
+        calcular_municipios,
+        fuentes=["./assets/poblacion_municipal.csv"],
+    )
 
-    # Cargamos el dataset de población por municipio.
-    pop = pd.read_csv("./assets/poblacion_municipal.csv", dtype=pop_types, index_col=0)
 
-    # Seleccionamos las cifras del año de nuestro interés.
-    pop = pop[str(año)]
+def calcular_municipios(año):
+    """
+    Calcula a partir de los datasets el resultado de preparar_municipios().
 
-    # Cargamos el dataset de dengue del año que nos interesa.
-    df = pd.read_csv(f"./data/{año}.csv")
+    Parameters
+    ----------
+    año: int
+        El año que se desea calcular.
 
-    # IMPORTANTE: Solo seleccionamos casos confirmados.
-    df = df[df["ESTATUS_CASO"] == 2]
+    Returns
+    -------
+    pandas.DataFrame
+        Los municipios con sus casos confirmados, población y tasa.
 
-    # Arreglamos las columnas de los identificadores de entidad y municipio.
-    df["ENTIDAD_RES"] = df["ENTIDAD_RES"].astype(str).str.zfill(2)
-    df["MUNICIPIO_RES"] = df["MUNICIPIO_RES"].astype(str).str.zfill(3)
+    """
 
-    # Calculamos el total de casos confirmados.
-    total_casos = len(df)
+    # Cargamos el dataset de población por municipio.
+    # El índice CVE se lee como entero (por ejemplo, 01001 se vuelve 1001).
+    pop = pd.read_csv("./assets/poblacion_municipal.csv", index_col=0)
 
-    # Calculamos el total de población del año que nos interesa.
-    total_pop = pop.sum()
+    # Renombramos algunos estados a sus nombres más comunes.
+    pop["Entidad"] = pop["Entidad"].replace(
+        {
+            "Coahuila de Zaragoza": "Coahuila",
+            "México": "Estado de México",
+            "Michoacán de Ocampo": "Michoacán",
+            "Veracruz de Ignacio de la Llave": "Veracruz",
+        }
+    )
 
-    # Arreglamos las columnas de los identificadores de entidad y municipio.
-    df["ENTIDAD_RES"] = df["ENTIDAD_RES"].astype(str).str.zfill(2)
-    df["MUNICIPIO_RES"] = df["MUNICIPIO_RES"].astype(str).str.zfill(3)
+    # Seleccionamos las columnas de nuestro interés.
+    pop = pop[["Entidad", "Municipio", str(año)]]
+
+    # Renombramos las columnas.
+    pop.columns = ["entidad", "municipio", "poblacion"]
+
+    # Cargamos el dataset de dengue del año que nos interesa.
+    # Solo leemos las columnas que vamos a utilizar.
+    # IMPORTANTE: Solo seleccionamos casos confirmados.
+    df = cargar_dataset(
+        año, ["ENTIDAD_RES", "MUNICIPIO_RES"], filtros=[("ESTATUS_CASO", "==", 2)]
+    )
 
     # Creamos la columna CVE para el DataFrame de dengue.
-    df["CVE"] = df["ENTIDAD_RES"] + df["MUNICIPIO_RES"]
+    # La clave se compone de 2 dígitos de la entidad y 3 del municipio,
+    # por lo que la podemos calcular como entero sin crear cadenas.
+    df["CVE"] = crear_cve(df)
 
     # Contamos el total de registro para cada CVE.
-    df = df["CVE"].value_counts().to_frame("total")
+    # Las claves son enteras y no necesitamos que estén ordenadas.
+    df = df.groupby("CVE", sort=False).size().to_frame("total")
 
-    # Agregamos las cifras de población.
-    df["poblacion"] = pop
+    # Unimos ambos DataFrames. Conservamos todos los municipios para poder
+    # calcular la población total y todas las claves para el total de casos.
+    df = pop.join(df, how="outer")
+    df["total"] = df["total"].fillna(0).astype(int)
 
     # Calculamos la tasa por cada 100k habitantes.
     df["tasa"] = df["total"] / df["poblacion"] * 100000
 
+    return df
+
+
+def mapa_municipios(año, df=None, escala=0.5):
+    """
+    Crea un mapa Choropleth de casos confirmados
+     de dengue en México por municipio.
+
+    Parameters
+    ----------
+    año: int
+        El año que se desea graficar.
+
+    df: pandas.DataFrame
+        Los municipios ya calculados con preparar_municipios().
+        Si no se especifica, se calculan a partir del dataset.
+
+    escala: float
+        La escala de la imagen exportada. El lienzo mide 7680x4320,
+        con 0.5 se exporta a 3840x2160 y con 1 a su tamaño completo.
+
+    """
+
+    if df is None:
+        df = preparar_municipios(año)
+
+    # Calculamos el total de casos confirmados.
+    total_casos = df["total"].sum()
+
+    # Calculamos el total de población del año que nos interesa.
+    total_pop = df["poblacion"].sum()
+
     # Para este mapa vamos a filtrar todos los municipios sin registros
     # ya que el dengue no afecta a todo el país y muchos valores en
     # cero puede sesgar los resultados.
@@ -65,23 +155,27 @@ def mapa_municipios(año):
     df = df[df["tasa"] != 0]
 
     # Calculamos algunas estadísticas descriptivas.
+    # Los cuantiles se calculan juntos para no recorrer la serie varias veces.
+    resumen = df["tasa"].agg(["mean", "median", "std", "min", "max"])
+    cuantiles = df["tasa"].quantile([0.25, 0.75, 0.95])
+
     estadisticas = [
         "Estadísticas descriptivas",
-        f"Media: <b>{df['tasa'].mean():,.1f}</b>",
-        f"Mediana: <b>{df['tasa'].median():,.1f}</b>",
-        f"DE: <b>{df['tasa'].std():,.1f}</b>",
-        f"25%: <b>{df['tasa'].quantile(.25):,.1f}</b>",
-        f"75%: <b>{df['tasa'].quantile(.75):,.1f}</b>",
-        f"95%: <b>{df['tasa'].quantile(.95):,.1f}</b>",
-        f"Máximo: <b>{df['tasa'].max():,.1f}</b>",
+        f"Media: <b>{resumen['mean']:,.1f}</b>",
+        f"Mediana: <b>{resumen['median']:,.1f}</b>",
+        f"DE: <b>{resumen['std']:,.1f}</b>",
+        f"25%: <b>{cuantiles[0.25]:,.1f}</b>",
+        f"75%: <b>{cuantiles[0.75]:,.1f}</b>",
+        f"95%: <b>{cuantiles[0.95]:,.1f}</b>",
+        f"Máximo: <b>{resumen['max']:,.1f}</b>",
     ]
     estadisticas = "<br>".join(estadisticas)
 
     # Determinamos los valores mínimos y máximos para nuestra escala.
     # Para el valor máximo usamos el 95 percentil para mitigar los
     # efectos de valores atípicos.
-    valor_min = df["tasa"].min()
-    valor_max = df["tasa"].quantile(0.95)
+    valor_min = resumen["min"]
+    valor_max = cuantiles[0.95]
 
     # Vamos a crear nuestra escala con 13 intervalos.
     marcas = np.linspace(valor_min, valor_max, 13)
@@ -97,26 +191,14 @@ def mapa_municipios(año):
     etiquetas[-1] = f"≥{valor_max:,.0f}"
 
     # Cargamos el GeoJSON de municipios de México.
-    geojson = json.loads(open("./assets/mexico2019.json", "r", encoding="utf-8").read())
+    geojson = cargar_geojson("./assets/mexico2019.json")
 
     # Estas listas serán usadas para configurar el mapa Choropleth.
-    ubicaciones = list()
-    valores = list()
-
-    # Iteramos sobre cada municipio e nuestro GeoJSON.
-    for item in geojson["features"]:
-        geo = str(item["properties"]["CVEGEO"])
-
-        # Si el municipio no se encuentra en nuestro DataFrame,
-        # agregamos un valor nulo.
-        try:
-            value = df.loc[geo]["tasa"]
-        except Exception:
-            value = None
-
-        # Agregamos el objeto del municipio y su valor a las listas correspondientes.
-        ubicaciones.append(geo)
-        valores.append(value)
+    # Buscamos la tasa de cada municipio de nuestro GeoJSON en un diccionario.
+    # Si el municipio no se encuentra en nuestro DataFrame, queda un valor nulo.
+    tasas = df["tasa"].to_dict()
+    ubicaciones = [str(item["properties"]["CVEGEO"]) for item in geojson["features"]]
+    valores = [tasas.get(int(geo)) for geo in ubicaciones]
 
     # Calculamos los valores para nuestro subtítulo.
     subtitulo = f"Tasa nacional: <b>{total_casos / total_pop * 100000:,.1f}</b> (con <b>{total_casos:,.0f}</b> casos confirmados)"
@@ -160,21 +242,15 @@ def mapa_municipios(año):
     # de las entidades federativas.
 
     # Cargamos el archivo GeoJSON de México.
-    geojson_borde = json.loads(
-        open("./assets/mexico.json", "r", encoding="utf-8").read()
-    )
+    geojson_borde = cargar_geojson("./assets/mexico.json")
 
     # Estas listas serán usadas para configurar el mapa Choropleth.
-    ubicaciones_borde = list()
-    valores_borde = list()
-
-    # Iteramos sobre cada entidad dentro de nuestro archivo GeoJSON de México.
-    for item in geojson_borde["features"]:
-        geo = item["properties"]["NOMGEO"]
-
-        # Alimentamos las listas creadas anteriormente con la ubicación y su valor per capita.
-        ubicaciones_borde.append(geo)
-        valores_borde.append(1)
+    # Todas las entidades tienen el mismo valor, ya que solo nos interesan
+    # sus contornos.
+    ubicaciones_borde = [
+        item["properties"]["NOMGEO"] for item in geojson_borde["features"]
+    ]
+    valores_borde = [1] * len(ubicaciones_borde)
 
     # Este mapa tiene mucho menos personalización.
     # Lo único que necesitamos es que muestre los contornos
@@ -276,10 +352,12 @@ def mapa_municipios(año):
         ],
     )
 
-    fig.write_image(f"./municipal_{año}.png")
+    # Escalar la imagen al exportarla conserva las proporciones del diseño
+    # y reduce el trabajo de renderizado y compresión del PNG.
+    fig.write_image(f"./municipal_{año}.png", scale=escala)
 
 
-def top_municipios_tabla(año):
+def top_municipios_tabla(año, df=None):
     """
     Crea una tabla desglosando los 30 municipios con mayor incidencia
     de dengue en México.
@@ -289,56 +367,14 @@ def top_municipios_tabla(año):
     año: int
         El año que se desea graficar.
 
-    """
-
-    # El índice lo vamos a necesitar como cadena.
-    pop_types = {"CVE": str}
+    df: pandas.DataFrame
+        Los municipios ya calculados con preparar_municipios().
+        Si no se especifica, se calculan a partir del dataset.
 
-    # Cargamos el dataset de población por municipio.
-    pop = pd.read_csv("./assets/poblacion_municipal.csv", dtype=pop_types, index_col=0)
-
-    # Renombramos algunos estados a sus nombres más comunes.
-    pop["Entidad"] = pop["Entidad"].replace(
-        {
-            "Coahuila de Zaragoza": "Coahuila",
-            "México": "Estado de México",
-            "Michoacán de Ocampo": "Michoacán",
-            "Veracruz de Ignacio de la Llave": "Veracruz",
-        }
-    )
-
-    # Seleccionamos las columnas de nuestro interés.
-    pop = pop[["Entidad", "Municipio", str(año)]]
-
-    # Renombramos las columnas.
-    pop.columns = ["entidad", "municipio", "poblacion"]
-
-    # Cargamos el dataset de dengue del año que nos interesa.
-    df = pd.read_csv(f"./data/{año}.csv")
-
-    # IMPORTANTE: Solo seleccionamos casos confirmados.
-    df = df[df["ESTATUS_CASO"] == 2]
-
-    # Arreglamos las columnas de los identificadores de entidad y municipio.
-    df["ENTIDAD_RES"] = df["ENTIDAD_RES"].astype(str).str.zfill(2)
-    df["MUNICIPIO_RES"] = df["MUNICIPIO_RES"].astype(str).str.zfill(3)
-
-    # Creamos la columna CVE para el DataFrame de dengue.
-    df["CVE"] = df["ENTIDAD_RES"] + df["MUNICIPIO_RES"]
-
-    # Contamos el total de registro para cada CVE.
-    df = df["CVE"].value_counts().to_frame("total")
-
-    # Unimos ambos DataFrames.
-    df = df.join(
-        pop,
-    )
-
-    # Calculamos la tasa por cada 100k habitantes.
-    df["tasa"] = df["total"] / df["poblacion"] * 100000
+    """
 
-    # Creamos la columna de nombre que se compone del nombre de la entidad y municipio.
-    df["nombre"] = df["municipio"] + ", " + df["entidad"]
+    if df is None:
+        df = preparar_municipios(año)
 
     # Para esta tabla vamos a filtrar valores en 0
     # y solo tomaremos en cuenta municipios con al menos 100 casos confirmados.
@@ -346,6 +382,9 @@ def top_municipios_tabla(año):
     df = df[df["tasa"] != 0]
     df = df[df["total"] >= 100]
 
+    # Creamos la columna de nombre que se compone del nombre de la entidad y municipio.
+    df["nombre"] = df["municipio"] + ", " + df["entidad"]
+
     # Ordenamos los resultados por la tasa de mayor a menor.
     df.sort_values("tasa", ascending=False, inplace=True)
 
@@ -428,5 +467,8 @@ def top_municipios_tabla(año):
 
 
 if __name__ == "__main__":
-    mapa_municipios(2024)
-    top_municipios_tabla(2024)
+    # Ambas gráficas usan los mismos datos, así que los calculamos una sola vez.
+    municipios = preparar_municipios(2024)
+
+    mapa_municipios(2024, municipios)
+    top_municipios_tabla(2024, municipios)
@@ -1,8 +1,11 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.colors import qualitative
 from plotly.subplots import make_subplots
 
+from datos import cargar_dataset
+
 
 SEROTIPOS = {
     1: "DENV-1",
@@ -13,6 +16,36 @@ SEROTIPOS = {
 }
 
 
+def contar_serotipos(valores):
+    """
+    Cuenta los registros de cada serotipo.
+
+    Parameters
+    ----------
+    valores: numpy.ndarray
+        Los valores de 'RESULTADO_PCR' (del 1 al 5) a contar.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El total de registros por serotipo (índice) en la columna 'total'.
+        Solo se incluyen los serotipos con al menos un registro.
+        Los códigos fuera del 1 al 5 no se cuentan.
+
+    """
+
+    # Descartamos los códigos que no corresponden a ningún serotipo.
+    valores = valores[(valores >= 1) & (valores <= len(SEROTIPOS))]
+
+    # Como los valores son enteros pequeños, np.bincount los cuenta
+    # directamente por posición. La posición 0 no corresponde a ningún serotipo.
+    conteo = np.bincount(valores, minlength=len(SEROTIPOS) + 1)[1:]
+
+    df = pd.DataFrame({"total": conteo}, index=pd.Index(list(SEROTIPOS.values())))
+
+    return df[df["total"] > 0]
+
+
 def main(año):
     """
     Crea gráficas de dona con los casos confirmados y
@@ -26,35 +59,34 @@ def main(año):
     """
 
     # Cargamos el dataset de dengue del año que nos interesa.
-    df = pd.read_csv(f"./data/{año}.csv")
-
-    # Seleccionamos los casos confirmados y agrupamos por serotipo.
-    casos = (
-        df[df["ESTATUS_CASO"] == 2]["RESULTADO_PCR"]
-        .value_counts()
-        .to_frame("total")
-        .sort_index()
-    )
-    casos.index = casos.index.map(SEROTIPOS)
+    # Solo leemos las columnas que vamos a utilizar.
+    df = cargar_dataset(año, ["ESTATUS_CASO", "DICTAMEN", "RESULTADO_PCR"])
+
+    # Calculamos ambos filtros una sola vez sobre los arreglos de NumPy.
+    # Los valores nulos de 'DICTAMEN' no cuentan como defunciones.
+    serotipos = df["RESULTADO_PCR"].to_numpy()
+    es_caso = df["ESTATUS_CASO"].to_numpy() == 2
+    es_defuncion = df["DICTAMEN"].to_numpy(dtype="int8", na_value=0) == 1
+
+    # Seleccionamos los casos confirmados y contamos por serotipo.
+    casos = contar_serotipos(serotipos[es_caso])
     casos["perc"] = casos["total"] / casos["total"].sum() * 100
 
-    casos["texto"] = casos.apply(
-        lambda x: f"<b>{x['perc']:,.2f}%</b><br>({x['total']:,.0f})", axis=1
-    )
+    casos["texto"] = [
+        f"<b>{perc:,.2f}%</b><br>({total:,.0f})"
+        for perc, total in zip(casos["perc"].to_numpy(), casos["total"].to_numpy())
+    ]
 
-    # Seleccionamos las defunciones y agrupamos por serotipo.
-    defunciones = (
-        df[df["DICTAMEN"] == 1]["RESULTADO_PCR"]
-        .value_counts()
-        .to_frame("total")
-        .sort_index()
-    )
-    defunciones.index = defunciones.index.map(SEROTIPOS)
+    # Seleccionamos las defunciones y contamos por serotipo.
+    defunciones = contar_serotipos(serotipos[es_defuncion])
     defunciones["perc"] = defunciones["total"] / defunciones["total"].sum() * 100
 
-    defunciones["texto"] = defunciones.apply(
-        lambda x: f"<b>{x['perc']:,.2f}%</b><br>({x['total']:,.0f})", axis=1
-    )
+    defunciones["texto"] = [
+        f"<b>{perc:,.2f}%</b><br>({total:,.0f})"
+        for perc, total in zip(
+            defunciones["perc"].to_numpy(), defunciones["total"].to_numpy()
+        )
+    ]
 
     # Definimos los títulos para cada gráfica de dona.
     titulos = [